@@ -9,8 +9,9 @@ import sqlite3
 import subprocess
 import sys
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Iterable, Iterator, Optional
 from pathlib import Path
 
 
@@ -33,6 +34,7 @@ class AudioProcessor:
         force: bool = False,
         limit: Optional[int] = None,
         batch_size: int = 100,
+        concurrency: int = 8,
         no_subdirs: bool = False,
     ):
         self.bucket = bucket
@@ -43,6 +45,7 @@ class AudioProcessor:
         self.force = force
         self.limit = limit
         self.batch_size = batch_size
+        self.concurrency = concurrency
         self.no_subdirs = no_subdirs
         self.conn = None
         self.setup_logging()
@@ -79,7 +82,11 @@ class AudioProcessor:
             "CREATE INDEX IF NOT EXISTS idx_master_id ON customer_recordings(master_id);",
             "CREATE INDEX IF NOT EXISTS idx_filename ON customer_recordings(filename);",
             "CREATE INDEX IF NOT EXISTS idx_timestamp ON customer_recordings(timestamp);",
-            "CREATE INDEX IF NOT EXISTS idx_eaf_complete ON customer_recordings(eaf_complete);",
+            # Serves the pending-recordings scans in update_eafs.py and
+            # submit_diarization_jobs.py, and any eaf_complete lookup, so the
+            # old single-column index is redundant
+            "CREATE INDEX IF NOT EXISTS idx_customer_recordings_covering ON customer_recordings(eaf_complete, id, master_id, filename, timestamp);",
+            "DROP INDEX IF EXISTS idx_eaf_complete;",
         ]
 
         try:
@@ -94,64 +101,92 @@ class AudioProcessor:
             logging.error(f"Failed to create table or indexes: {e}")
             sys.exit(1)
 
-    def fetch_recordings(self) -> List[CustomerRecording]:
+    def fetch_recordings(self) -> Iterator[CustomerRecording]:
+        # Keyset pages yielded one recording at a time, so rows are pulled as
+        # the bounded download window in process_recordings frees up
         query = """
             SELECT id, master_id, filename, timestamp
             FROM customer_recordings
-            LIMIT ? OFFSET ?
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
         """
-        offset = 0
-        recordings = []
+        last_id = 0
+        count = 0
 
         try:
+            cursor = self.conn.cursor()
             while True:
-                cursor = self.conn.cursor()
-                cursor.execute(query, (self.batch_size, offset))
+                cursor.execute(query, (last_id, self.batch_size))
                 batch = cursor.fetchall()
 
                 if not batch:
                     break
 
-                recordings.extend(
-                    [
-                        CustomerRecording(
-                            id=row["id"],
-                            master_id=row["master_id"],
-                            filename=row["filename"],
-                            timestamp=row["timestamp"],
-                        )
-                        for row in batch
-                    ]
-                )
-
-                offset += self.batch_size
-
-                if self.limit and len(recordings) >= self.limit:
-                    recordings = recordings[: self.limit]
+                if self.limit:
+                    batch = batch[: self.limit - count]
+
+                for row in batch:
+                    yield CustomerRecording(
+                        id=row["id"],
+                        master_id=row["master_id"],
+                        filename=row["filename"],
+                        timestamp=row["timestamp"],
+                    )
+
+                count += len(batch)
+                last_id = batch[-1]["id"]
+
+                if self.limit and count >= self.limit:
                     break
 
-            logging.info(f"Fetched {len(recordings)} recordings from the database.")
-            return recordings
+            logging.info(f"Fetched {count} recordings from the database.")
         except sqlite3.Error as e:
             logging.error(f"Failed to fetch recordings: {e}")
             sys.exit(1)
 
-    def process_recordings(self, recordings: List[CustomerRecording]):
-        for recording in recordings:
-            s3_key = f"{recording.master_id}/{recording.filename}"
-            if self.no_subdirs:
-                local_path = self.directory / recording.filename
-            else:
-                local_path = (
-                    self.directory / str(recording.master_id) / recording.filename
-                )
-
-            if not self.force and local_path.exists():
-                logging.debug(f"Skipping existing file: {local_path}")
-                continue
-
-            if self.download_file(s3_key, local_path):
-                self.process_audio(local_path)
+    def process_recordings(self, recordings: Iterable[CustomerRecording]):
+        # Downloads are network-bound, so keep several in flight at once, but
+        # cap the pending window so a long recording list isn't turned into
+        # futures all up front
+        max_pending = self.concurrency * 2
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = {}
+            # The exists() check below only sees finished files, so also skip
+            # paths a queued job is already writing (e.g. same filename under
+            # --no-subdirs)
+            in_flight = set()
+            for recording in recordings:
+                s3_key = f"{recording.master_id}/{recording.filename}"
+                if self.no_subdirs:
+                    local_path = self.directory / recording.filename
+                else:
+                    local_path = (
+                        self.directory / str(recording.master_id) / recording.filename
+                    )
+
+                if not self.force and local_path.exists():
+                    logging.debug(f"Skipping existing file: {local_path}")
+                    continue
+
+                if local_path in in_flight:
+                    logging.debug(f"Skipping file already being downloaded: {local_path}")
+                    continue
+
+                if len(pending) >= max_pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        in_flight.discard(pending.pop(future))
+                        future.result()
+                pending[executor.submit(self.process_recording, s3_key, local_path)] = local_path
+                in_flight.add(local_path)
+
+            for future in wait(pending).done:
+                future.result()
+
+    def process_recording(self, s3_key: str, local_path: Path):
+        if self.download_file(s3_key, local_path):
+            self.process_audio(local_path)
 
     def download_file(self, s3_key: str, local_path: Path) -> bool:
         local_path.parent.mkdir(parents=True, exist_ok=True)
@@ -261,6 +296,12 @@ def parse_arguments() -> argparse.Namespace:
         default=100,
         help="Number of records to fetch in each database query (default: %(default)s).",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Number of files to download and process concurrently (default: %(default)s).",
+    )
     parser.add_argument(
         "--limit",
         type=int,
@@ -287,6 +328,7 @@ def main():
         force=args.force,
         limit=args.limit,
         batch_size=args.batch_size,
+        concurrency=args.concurrency,
         no_subdirs=args.no_subdirs,
     )
     processor.run()
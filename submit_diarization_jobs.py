@@ -7,34 +7,77 @@ Also starts a local web server to serve audio files and receive webhook results.
 
 import argparse
 import logging
-import json
+import math
 import pprint
+import re
 from pathlib import Path
 import sqlite3
 import sys
 import time
 import threading
 import signal
-from os import environ
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
+from os import environ, scandir
+from os.path import splitext
+from urllib.parse import quote
+from email.utils import parsedate_to_datetime
 from dataclasses import dataclass
-from typing import List, Optional, Dict, Any
-import requests
-from flask import Flask, request, send_file, jsonify, abort
+from typing import Iterable, Iterator, Optional, Dict, Any, Set
+import orjson
+import httpx
+from flask import Flask, request, send_file, jsonify, abort, make_response
 from queue import Queue
 from threading import Event
-from werkzeug.serving import make_server
+from waitress import create_server
 
 # Constants
 API_BASE_URL = "https://api.pyannote.ai/v1"
 DIARIZE_ENDPOINT = f"{API_BASE_URL}/diarize"
+HTTP_POOL_SIZE = 50
+HTTP_TIMEOUT = 60
+MAX_RETRIES = 5
+# X-RateLimit-Reset values above this are epoch timestamps rather than delays
+RATE_LIMIT_EPOCH_THRESHOLD = 1_000_000_000
+DEFAULT_RETRY_AFTER = 60
+SQLITE_CACHED_STATEMENTS = 256
+RECORDING_BY_ID_QUERY = (
+    "SELECT id, master_id, filename, timestamp FROM customer_recordings WHERE id = ?"
+)
+# More flexible hostname validation
+HOSTNAME_REGEX = re.compile(
+    r"^(?=.{1,255}$)([0-9A-Za-z](?:(?:[0-9A-Za-z]|-){0,61}[0-9A-Za-z])?\.)+[A-Za-z]{2,63}$"
+)
+PENDING_RECORDINGS_QUERY = """
+    SELECT id, master_id, filename, timestamp
+    FROM customer_recordings
+    WHERE eaf_complete = 0 AND id > ?
+    ORDER BY id
+    LIMIT ?
+"""
 
 
 @dataclass
 class CustomerRecording:
+    __slots__ = (
+        "id",
+        "master_id",
+        "filename",
+        "timestamp",
+        "file_path",
+        "diarization_results_path",
+    )
+
     id: int
     master_id: int
     filename: str
     timestamp: int
+    file_path: Path
+    diarization_results_path: Path
 
 
 class DiarizationJobSubmitter:
@@ -46,8 +89,11 @@ class DiarizationJobSubmitter:
         results_directory: Path,
         endpoint_hostname: str,
         endpoint_port: int = 4321,
+        server_threads: int = 16,
         sleep: float = 0,
         batch_size: int = 100,
+        concurrency: int = 8,
+        accel_redirect_prefix: Optional[str] = None,
         limit: Optional[int] = None,
         force: bool = False,
         debug: bool = False,
@@ -62,12 +108,21 @@ class DiarizationJobSubmitter:
         self.results_directory = results_directory
         self.endpoint_hostname = endpoint_hostname
         self.endpoint_port = endpoint_port
+        self.server_threads = server_threads
         self.sleep = sleep
         self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.accel_redirect_prefix = (
+            accel_redirect_prefix.rstrip("/") if accel_redirect_prefix else None
+        )
         self.limit = limit
         self.force = force
         self.debug = debug
         self.conn = None
+        self.recording_index: Dict[int, CustomerRecording] = {}
+        self.audio_files: Set[str] = set()
+        self.results_files: Set[str] = set()
+        self.client = self.create_client()
         self.setup_logging()
         self.validate_endpoint_hostname()
 
@@ -75,55 +130,86 @@ class DiarizationJobSubmitter:
         self.app = Flask(__name__)
         self.setup_routes()
 
-        # Initialize job queue and event
-        self.job_queue = Queue()
+        # IDs of submitted jobs still waiting for their results, and event
+        self.outstanding_jobs: Set[int] = set()
+        self.jobs_condition = threading.Condition()
+        self.results_queue = Queue()
+        self.results_writer = None
         self.all_jobs_submitted = Event()
 
         # New attributes for server status
         self.server = None
         self.server_started = threading.Event()
         self.server_status = None
+        self.shutdown_event = threading.Event()
+
+        # Rate limiting state shared by the submission workers
+        self.rate_limit_lock = threading.Lock()
+        self.rate_limit_reset_time = 0.0
+        # Earliest time the next job may be submitted, spacing all workers'
+        # submissions --sleep seconds apart
+        self.next_submit_time = 0.0
         self.setup_signal_handler()
 
+    def create_client(self) -> httpx.Client:
+        # HTTP/2 multiplexes concurrent submissions over a single connection.
+        # Retries are handled by process_recordings, not the transport.
+        return httpx.Client(
+            http2=True,
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_SIZE,
+                max_keepalive_connections=HTTP_POOL_SIZE,
+            ),
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+            },
+        )
+
     def make_api_request(self, url, method="GET", data=None):
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
         try:
             if method == "GET":
-                response = requests.get(url, headers=headers)
+                response = self.client.get(url)
             elif method == "POST":
-                response = requests.post(url, headers=headers, json=data)
+                response = self.client.post(url, json=data)
             else:
                 raise ValueError(f"Unsupported HTTP method: {method}")
 
-            response.raise_for_status()
+            # 429 responses are handled by the caller's rate limiting logic
+            if response.status_code != 429:
+                response.raise_for_status()
             return response
-        except requests.exceptions.RequestException as e:
-            logging.error(f"API request failed: {e}")
+        except httpx.HTTPError as e:
+            logging.error("API request failed: %s", e)
             return None
 
-    def get_file_path(self, recording: CustomerRecording) -> Path:
-        return self.data_directory / recording.filename
-
-    def get_diarization_results_path(self, recording: CustomerRecording) -> Path:
-        return self.results_directory / f"{Path(recording.filename).stem}.json"
+    def get_file_path(self, filename: str) -> Path:
+        return self.data_directory / filename
+
+    def get_diarization_results_path(self, filename: str) -> Path:
+        return self.results_directory / f"{splitext(filename)[0]}.json"
+
+    def build_recording(self, row: sqlite3.Row) -> CustomerRecording:
+        # Paths are derived once here instead of on every skip check and webhook
+        return CustomerRecording(
+            id=row["id"],
+            master_id=row["master_id"],
+            filename=row["filename"],
+            timestamp=row["timestamp"],
+            file_path=self.get_file_path(row["filename"]),
+            diarization_results_path=self.get_diarization_results_path(row["filename"]),
+        )
 
     def validate_endpoint_hostname(self):
-        import re
-
-        # More flexible hostname validation
-        hostname_regex = re.compile(
-            r"^(?=.{1,255}$)([0-9A-Za-z](?:(?:[0-9A-Za-z]|-){0,61}[0-9A-Za-z])?\.)+[A-Za-z]{2,63}$"
-        )
-        if not hostname_regex.match(self.endpoint_hostname):
+        if not HOSTNAME_REGEX.match(self.endpoint_hostname):
             logging.error(
-                f"Invalid endpoint hostname: {self.endpoint_hostname}. Must be a valid hostname."
+                "Invalid endpoint hostname: %s. Must be a valid hostname.",
+                self.endpoint_hostname,
             )
             sys.exit(1)
         else:
-            logging.debug(f"Endpoint hostname {self.endpoint_hostname} validated.")
+            logging.debug("Endpoint hostname %s validated.", self.endpoint_hostname)
 
     def _validate_diarization_json(self, data: Dict[str, Any]) -> bool:
         """
@@ -167,60 +253,103 @@ class DiarizationJobSubmitter:
             level=level, format="%(asctime)s - %(levelname)s - %(message)s"
         )
         if self.debug:
-            logging.debug(f"Debug mode enabled. Arguments: {self.__dict__}")
+            logging.debug("Debug mode enabled. Arguments: %s", self.__dict__)
 
     def get_db_connection(self):
         try:
-            conn = sqlite3.connect(self.db_name, check_same_thread=False)
+            conn = sqlite3.connect(
+                self.db_name,
+                check_same_thread=False,
+                cached_statements=SQLITE_CACHED_STATEMENTS,
+                # Autocommit: read-only lookups never open a transaction
+                isolation_level=None,
+            )
             conn.row_factory = sqlite3.Row
-            logging.debug(f"Successfully connected to the database: {self.db_name}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA cache_size = -65536")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            conn.execute("PRAGMA mmap_size = 268435456")
+            logging.debug("Successfully connected to the database: %s", self.db_name)
+            self.create_index_if_not_exists(conn)
             return conn
         except sqlite3.Error as e:
-            logging.error(f"Failed to connect to the database: {e}")
+            logging.error("Failed to connect to the database: %s", e)
             sys.exit(1)
 
-    def fetch_recordings(self) -> List[CustomerRecording]:
-        query = """
-            SELECT id, master_id, filename, timestamp
-            FROM customer_recordings
-            WHERE eaf_complete = 0
-            LIMIT ? OFFSET ?
+    def create_index_if_not_exists(self, conn: sqlite3.Connection):
+        # Covers every column read by PENDING_RECORDINGS_QUERY, so pages are
+        # served from the index without visiting the table rows.
+        create_index_query = """
+            CREATE INDEX IF NOT EXISTS idx_customer_recordings_covering
+            ON customer_recordings(eaf_complete, id, master_id, filename, timestamp)
         """
-        offset = 0
-        recordings = []
+        with conn:
+            conn.execute(create_index_query)
+        logging.debug("Covering index on customer_recordings created or already exists.")
+
+    def scan_audio_files(self):
+        # One directory read up front replaces a pair of stat() calls per
+        # recording at submission time and again on every audio download.
+        try:
+            with scandir(self.data_directory) as entries:
+                self.audio_files = {entry.name for entry in entries if entry.is_file()}
+        except OSError as e:
+            logging.error("Failed to scan data directory %s: %s", self.data_directory, e)
+            sys.exit(1)
+        logging.debug(
+            "Found %d audio files in %s", len(self.audio_files), self.data_directory
+        )
+
+    def scan_results_files(self):
+        try:
+            with scandir(self.results_directory) as entries:
+                self.results_files = {
+                    entry.name for entry in entries if entry.name.endswith(".json")
+                }
+        except FileNotFoundError:
+            # No results have been saved yet
+            self.results_files = set()
+        except OSError as e:
+            logging.error(
+                "Failed to scan results directory %s: %s", self.results_directory, e
+            )
+            sys.exit(1)
+        logging.debug(
+            "Found %d existing diarization results in %s",
+            len(self.results_files),
+            self.results_directory,
+        )
+
+    def fetch_recordings(self) -> Iterator[CustomerRecording]:
+        last_id = 0
+        count = 0
 
         try:
             with self.get_db_connection() as conn:
                 while True:
-                    cursor = conn.cursor()
-                    cursor.execute(query, (self.batch_size, offset))
-                    batch = cursor.fetchall()
+                    batch = conn.execute(
+                        PENDING_RECORDINGS_QUERY, (last_id, self.batch_size)
+                    ).fetchall()
 
                     if not batch:
                         break
 
-                    recordings.extend(
-                        [
-                            CustomerRecording(
-                                id=row["id"],
-                                master_id=row["master_id"],
-                                filename=row["filename"],
-                                timestamp=row["timestamp"],
-                            )
-                            for row in batch
-                        ]
-                    )
+                    if self.limit:
+                        batch = batch[: self.limit - count]
 
-                    offset += self.batch_size
+                    for row in batch:
+                        yield self.build_recording(row)
 
-                    if self.limit and len(recordings) >= self.limit:
-                        recordings = recordings[: self.limit]
+                    count += len(batch)
+                    last_id = batch[-1]["id"]
+
+                    if self.limit and count >= self.limit:
                         break
 
-            logging.info(f"Fetched {len(recordings)} recordings from the database.")
-            return recordings
+            logging.info("Fetched %d recordings from the database.", count)
         except sqlite3.Error as e:
-            logging.error(f"Failed to fetch recordings: {e}")
+            logging.error("Failed to fetch recordings: %s", e)
             sys.exit(1)
 
     def setup_routes(self):
@@ -228,75 +357,142 @@ class DiarizationJobSubmitter:
         def serve_audio(recording_id):
             recording = self.get_recording_by_id(recording_id)
             if not recording:
-                logging.error(f"Recording not found: ID {recording_id}")
+                logging.error("Recording not found: ID %d", recording_id)
                 abort(404)
-            file_path = self.get_file_path(recording)
-            if not file_path.exists() or not file_path.is_file():
-                logging.error(f"Audio file not found: {file_path}")
+            file_path = recording.file_path
+            if recording.filename not in self.audio_files:
+                logging.error("Audio file not found: %s", file_path)
                 abort(404)
-            logging.debug(f"Serving audio file: {file_path}")
+            if self.accel_redirect_prefix:
+                # Let the fronting nginx stream the file via sendfile(2)
+                logging.debug("Redirecting audio file to proxy: %s", file_path)
+                response = make_response("")
+                response.headers["X-Accel-Redirect"] = (
+                    f"{self.accel_redirect_prefix}/{quote(recording.filename)}"
+                )
+                response.headers["Content-Type"] = "audio/wav"
+                return response
+            logging.debug("Serving audio file: %s", file_path)
             return send_file(file_path.resolve(), mimetype="audio/wav", conditional=True)
 
         @self.app.route("/results/<int:recording_id>", methods=["POST"])
         def receive_results(recording_id):
             recording = self.get_recording_by_id(recording_id)
             if not recording:
-                logging.error(f"Recording not found: ID {recording_id}")
+                logging.error("Recording not found: ID %d", recording_id)
                 abort(404)
-            data = request.get_json()
+            raw_data = request.get_data(cache=False)
+            try:
+                data = orjson.loads(raw_data)
+            except orjson.JSONDecodeError:
+                data = None
             if not self._validate_diarization_json(data):
                 logging.error(
-                    f"Invalid JSON data received for recording ID {recording_id} (filename: {recording.filename})"
+                    "Invalid JSON data received for recording ID %d (filename: %s)",
+                    recording_id,
+                    recording.filename,
                 )
                 if self.debug:
                     pprint.pprint(data)
                 abort(400)
-            diarization_results_path = self.get_diarization_results_path(recording)
+            # Acknowledge right away; the results writer thread saves the file
+            self.results_queue.put((recording, raw_data))
+            return jsonify({"status": "received"}), 200
+
+    def start_results_writer(self):
+        self.results_writer = threading.Thread(target=self.write_results, daemon=True)
+        self.results_writer.start()
+
+    def stop_results_writer(self):
+        # Webhooks were acknowledged before their results were saved, and
+        # they won't be resent, so finish writing everything queued
+        if self.results_writer:
+            self.results_queue.put(None)
+            self.results_writer.join()
+            self.results_writer = None
+
+    def write_results(self):
+        while True:
+            item = self.results_queue.get()
+            if item is None:
+                return
+            recording, raw_data = item
             try:
-                diarization_results_path.parent.mkdir(parents=True, exist_ok=True)
-                with diarization_results_path.open("w") as f:
-                    json.dump(data, f, indent=4)
-                logging.info(
-                    f"Received and saved diarization results for recording ID {recording_id} (filename: {recording.filename}) at {diarization_results_path}"
+                self.save_diarization_results(recording, raw_data)
+            except Exception:
+                logging.exception(
+                    "Unexpected error saving diarization results for recording ID %d (filename: %s)",
+                    recording.id,
+                    recording.filename,
                 )
-                self.job_queue.task_done()  # Mark the job as done
-                return jsonify({"status": "received"}), 200
-            except Exception as e:
-                logging.error(
-                    f"Failed to save diarization results for recording ID {recording_id} (filename: {recording.filename}): {e}"
-                )
-                abort(500)
+            finally:
+                # Always release the job so wait_for_completion can't hang
+                self.mark_job_done(recording.id)
+
+    def mark_job_done(self, recording_id: int):
+        with self.jobs_condition:
+            # Stray webhooks for jobs submitted by an earlier run are ignored
+            self.outstanding_jobs.discard(recording_id)
+            self.recording_index.pop(recording_id, None)
+            self.jobs_condition.notify_all()
+
+    def save_diarization_results(self, recording: CustomerRecording, raw_data: bytes):
+        diarization_results_path = recording.diarization_results_path
+        temp_path = diarization_results_path.with_name(
+            f"{diarization_results_path.name}.tmp"
+        )
+        try:
+            diarization_results_path.parent.mkdir(parents=True, exist_ok=True)
+            # The body was validated on receipt, so store it verbatim rather than
+            # re-serializing the parsed data.
+            temp_path.write_bytes(raw_data)
+            temp_path.replace(diarization_results_path)
+            logging.info(
+                "Received and saved diarization results for recording ID %d (filename: %s) at %s",
+                recording.id,
+                recording.filename,
+                diarization_results_path,
+            )
+        except OSError as e:
+            logging.error(
+                "Failed to save diarization results for recording ID %d (filename: %s): %s",
+                recording.id,
+                recording.filename,
+                e,
+            )
 
     def get_recording_by_id(self, recording_id: int) -> Optional[CustomerRecording]:
-        query = "SELECT id, master_id, filename, timestamp FROM customer_recordings WHERE id = ?"
+        # Recordings with a job in flight are indexed by process_recording; fall
+        # back to the database for finished jobs and IDs from elsewhere.
+        recording = self.recording_index.get(recording_id)
+        if recording:
+            return recording
         try:
-            with self.conn:  # This ensures proper transaction handling
-                cursor = self.conn.cursor()
-                cursor.execute(query, (recording_id,))
-                row = cursor.fetchone()
+            row = self.conn.execute(RECORDING_BY_ID_QUERY, (recording_id,)).fetchone()
             if row:
-                return CustomerRecording(
-                    id=row["id"],
-                    master_id=row["master_id"],
-                    filename=row["filename"],
-                    timestamp=row["timestamp"],
-                )
+                return self.build_recording(row)
             else:
                 return None
         except sqlite3.Error as e:
-            logging.error(f"Failed to get recording ID {recording_id}: {e}")
+            logging.error("Failed to get recording ID %d: %s", recording_id, e)
             return None
 
     def start_web_server(self):
         def run_app():
             try:
-                logging.info(f"Starting web server on port {self.endpoint_port}")
-                self.server = make_server('0.0.0.0', self.endpoint_port, self.app)
+                logging.info("Starting web server on port %d", self.endpoint_port)
+                server = create_server(
+                    self.app,
+                    host="0.0.0.0",
+                    port=self.endpoint_port,
+                    threads=self.server_threads,
+                )
+                self.server = server
                 self.server_status = True
                 self.server_started.set()
-                self.server.serve_forever()
+                server.run()
             except Exception as e:
-                logging.error(f"Failed to start web server: {e}")
+                logging.error("Failed to start web server: %s", e)
                 self.server_status = False
                 self.server_started.set()
 
@@ -317,13 +513,14 @@ class DiarizationJobSubmitter:
     def stop_web_server(self):
         if self.server:
             logging.info("Stopping web server...")
-            self.server.shutdown()
-            self.server.server_close()
+            server, self.server = self.server, None
+            server.close()
             logging.info("Web server stopped.")
 
     def setup_signal_handler(self):
         def signal_handler(signum, frame):
             logging.info("Received interrupt signal. Stopping server and exiting...")
+            self.shutdown_event.set()
             self.stop_web_server()
             sys.exit(0)
 
@@ -333,9 +530,8 @@ class DiarizationJobSubmitter:
     def process_recording(self, recording: CustomerRecording) -> dict:
         if self.should_skip_recording(recording):
             return {"success": True, "skipped": True}
-        if self.sleep > 0:
-            logging.info(f"Sleeping for {self.sleep} seconds between job submissions")
-            time.sleep(self.sleep)
+        if self.sleep > 0 and not self.wait_for_submission_slot():
+            return {"success": False, "rate_limited": False, "shutdown": True}
 
         file_url = f"https://{self.endpoint_hostname}/audio/{recording.id}"
         webhook_url = f"https://{self.endpoint_hostname}/results/{recording.id}"
@@ -343,96 +539,211 @@ class DiarizationJobSubmitter:
         request_data = {"url": file_url, "webhook": webhook_url}
 
         logging.info(
-            f"Submitting diarization job for recording ID {recording.id} (filename: {recording.filename})"
+            "Submitting diarization job for recording ID %d (filename: %s)",
+            recording.id,
+            recording.filename,
         )
+        # Register the job before submitting so a fast webhook cannot arrive
+        # before it is being tracked, and index the recording so the audio and
+        # results routes can find it without a query
+        with self.jobs_condition:
+            self.outstanding_jobs.add(recording.id)
+            self.recording_index[recording.id] = recording
         response = self.make_api_request(
             DIARIZE_ENDPOINT, method="POST", data=request_data
         )
 
+        if response is None or response.status_code != 200:
+            self.mark_job_done(recording.id)
+
         if response is None:
             return {"success": False, "rate_limited": False}
 
         if response.status_code == 200:
             logging.info(
-                f"Successfully submitted diarization job for recording ID {recording.id} (filename: {recording.filename})"
+                "Successfully submitted diarization job for recording ID %d (filename: %s)",
+                recording.id,
+                recording.filename,
             )
-            self.job_queue.put(recording.id)  # Add job to the queue
+            self.check_rate_limit_headers(response.headers)
             return {"success": True, "rate_limited": False}
         elif response.status_code == 429:
-            retry_after = int(response.headers.get("Retry-After", "60"))
+            retry_after = self.parse_retry_after(response.headers.get("Retry-After"))
             logging.warning(
-                f"Received 429 Too Many Requests, need to retry after {retry_after} seconds"
+                "Received 429 Too Many Requests, need to retry after %.2f seconds",
+                retry_after,
             )
             return {"success": False, "rate_limited": True, "retry_after": retry_after}
         else:
             logging.error(
-                f"Failed to submit diarization job for recording ID {recording.id} (filename: {recording.filename}), status code: {response.status_code}, response: {response.text}"
+                "Failed to submit diarization job for recording ID %d (filename: %s), status code: %d, response: %s",
+                recording.id,
+                recording.filename,
+                response.status_code,
+                response.text,
             )
             return {"success": False, "rate_limited": False}
 
     def should_skip_recording(self, recording: CustomerRecording) -> bool:
-        file_path = self.get_file_path(recording)
-        diarization_results_path = self.get_diarization_results_path(recording)
+        file_path = recording.file_path
+        diarization_results_path = recording.diarization_results_path
 
-        if diarization_results_path.exists() and not self.force:
+        if not self.force and diarization_results_path.name in self.results_files:
             logging.info(
-                f"Diarization results already exist for recording ID {recording.id} (filename: {recording.filename}), skipping"
+                "Diarization results already exist for recording ID %d (filename: %s), skipping",
+                recording.id,
+                recording.filename,
             )
             return True
 
-        if not file_path.exists() or not file_path.is_file():
+        if recording.filename not in self.audio_files:
             logging.error(
-                f"Audio file not found: {file_path}, skipping recording ID {recording.id} (filename: {recording.filename})"
+                "Audio file not found: %s, skipping recording ID %d (filename: %s)",
+                file_path,
+                recording.id,
+                recording.filename,
             )
             return True
 
         return False
 
-    def process_recordings(self, recordings: List[CustomerRecording]):
-        rate_limit_reset_time = None
-        index = 0
-        max_retries = 5
+    def wait_for_rate_limit(self) -> bool:
+        while True:
+            with self.rate_limit_lock:
+                sleep_time = self.rate_limit_reset_time - time.time()
+            if sleep_time <= 0:
+                return True
+            logging.info("Sleeping for %.2f seconds due to rate limiting", sleep_time)
+            if self.shutdown_event.wait(sleep_time):
+                return False
+
+    def wait_for_submission_slot(self) -> bool:
+        # Reserve the next slot under the lock, then wait for it outside so
+        # other workers can queue up behind it
+        with self.rate_limit_lock:
+            now = time.time()
+            slot = max(self.next_submit_time, now)
+            self.next_submit_time = slot + self.sleep
+        sleep_time = slot - now
+        if sleep_time <= 0:
+            return True
+        logging.info("Sleeping for %.2f seconds between job submissions", sleep_time)
+        return not self.shutdown_event.wait(sleep_time)
+
+    def parse_retry_after(self, value: Optional[str]) -> float:
+        # Retry-After is either delay-seconds or an HTTP-date
+        if value is None:
+            return DEFAULT_RETRY_AFTER
+        try:
+            seconds = float(value)
+            if math.isfinite(seconds):
+                return max(seconds, 0)
+        except ValueError:
+            pass
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            logging.warning(
+                "Unparseable Retry-After header %r, retrying after %d seconds",
+                value,
+                DEFAULT_RETRY_AFTER,
+            )
+            return DEFAULT_RETRY_AFTER
+
+    def set_rate_limit(self, retry_after: float):
+        with self.rate_limit_lock:
+            self.rate_limit_reset_time = max(
+                self.rate_limit_reset_time, time.time() + retry_after
+            )
+        logging.warning(
+            "Setting rate limit reset time to %.2f seconds from now", retry_after
+        )
+
+    def check_rate_limit_headers(self, headers: httpx.Headers):
+        # Pause before the quota runs out instead of waiting to be sent a 429
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
+        try:
+            remaining = int(remaining)
+            reset = float(reset)
+        except ValueError:
+            logging.debug(
+                "Ignoring malformed rate limit headers: remaining=%s, reset=%s",
+                remaining,
+                reset,
+            )
+            return
+        if remaining >= self.concurrency:
+            return
+        # The reset value may be an epoch timestamp or a delay in seconds
+        retry_after = reset - time.time() if reset > RATE_LIMIT_EPOCH_THRESHOLD else reset
+        if retry_after > 0:
+            logging.info("Only %d API requests remaining in the current window", remaining)
+            self.set_rate_limit(retry_after)
+
+    def submit_recording(self, recording: CustomerRecording):
         retry_count = 0
 
-        while index < len(recordings):
-            if rate_limit_reset_time and time.time() < rate_limit_reset_time:
-                sleep_time = rate_limit_reset_time - time.time()
-                logging.info(
-                    f"Sleeping for {sleep_time:.2f} seconds due to rate limiting"
-                )
-                time.sleep(sleep_time)
-                rate_limit_reset_time = None
+        while True:
+            if self.shutdown_event.is_set() or not self.wait_for_rate_limit():
+                logging.info("Shutdown requested, stopping job submission")
+                return
 
-            recording = recordings[index]
             result = self.process_recording(recording)
 
             if result["success"] or result.get("skipped", False):
-                index += 1
-                retry_count = 0
+                return
+            elif result.get("shutdown", False):
+                logging.info("Shutdown requested, stopping job submission")
+                return
             elif result["rate_limited"]:
-                rate_limit_reset_time = time.time() + result["retry_after"]
-                logging.warning(
-                    f"Setting rate limit reset time to {result['retry_after']} seconds from now"
-                )
+                self.set_rate_limit(result["retry_after"])
             else:
                 retry_count += 1
-                if retry_count >= max_retries:
+                if retry_count >= MAX_RETRIES:
                     logging.error(
-                        f"Max retries reached for recording ID {recording.id} (filename: {recording.filename}), moving to next recording"
-                    )
-                    index += 1
-                    retry_count = 0
-                else:
-                    logging.warning(
-                        f"Retrying recording ID {recording.id} (filename: {recording.filename}) (attempt {retry_count}/{max_retries})"
+                        "Max retries reached for recording ID %d (filename: %s), moving to next recording",
+                        recording.id,
+                        recording.filename,
                     )
+                    return
+                logging.warning(
+                    "Retrying recording ID %d (filename: %s) (attempt %d/%d)",
+                    recording.id,
+                    recording.filename,
+                    retry_count,
+                    MAX_RETRIES,
+                )
+
+    def process_recordings(self, recordings: Iterable[CustomerRecording]):
+        # Keep only a small window of submissions queued so recordings are
+        # pulled from the database as workers free up.
+        max_pending = self.concurrency * 2
+        pending = set()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for recording in recordings:
+                if self.shutdown_event.is_set():
+                    break
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(executor.submit(self.submit_recording, recording))
+
+            for future in as_completed(pending):
+                future.result()
 
         self.all_jobs_submitted.set()  # Signal that all jobs have been submitted
 
     def wait_for_completion(self):
         logging.info("Waiting for all diarization jobs to complete...")
         self.all_jobs_submitted.wait()  # Wait for all jobs to be submitted
-        self.job_queue.join()  # Wait for all jobs in the queue to be processed
+        with self.jobs_condition:
+            # Wait for the results of every submitted job to be saved
+            self.jobs_condition.wait_for(lambda: not self.outstanding_jobs)
         logging.info("All diarization jobs have completed.")
 
     def run(self):
@@ -440,7 +751,8 @@ class DiarizationJobSubmitter:
         logging.info("Starting diarization job submission script")
 
         try:
-            # Start the web server in another thread
+            # Start the results writer and the web server in other threads
+            self.start_results_writer()
             self.start_web_server()
 
             # Wait for the server to start and check its status
@@ -449,6 +761,8 @@ class DiarizationJobSubmitter:
                 sys.exit(1)  # Exit with error code
 
             self.conn = self.get_db_connection()
+            self.scan_audio_files()
+            self.scan_results_files()
             recordings = self.fetch_recordings()
             self.process_recordings(recordings)
 
@@ -459,10 +773,13 @@ class DiarizationJobSubmitter:
                 logging.debug("Database connection closed.")
 
             end_time = time.time()
-            logging.info(f"Total execution time: {end_time - start_time:.2f} seconds")
+            logging.info("Total execution time: %.2f seconds", end_time - start_time)
             logging.info("Diarization job submission script completed")
         finally:
+            self.client.close()
+            # Stop taking webhooks before draining the ones already received
             self.stop_web_server()
+            self.stop_results_writer()
 
 
 def parse_arguments() -> argparse.Namespace:
@@ -502,6 +819,12 @@ def parse_arguments() -> argparse.Namespace:
         default=4321,
         help="Port for the local web server (default: %(default)s).",
     )
+    parser.add_argument(
+        "--server-threads",
+        type=int,
+        default=16,
+        help="Number of worker threads for the local web server (default: %(default)s).",
+    )
     parser.add_argument(
         "--sleep",
         type=float,
@@ -514,6 +837,17 @@ def parse_arguments() -> argparse.Namespace:
         default=100,
         help="Number of records to fetch in each database query (default: %(default)s).",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Number of diarization jobs to submit concurrently (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--accel-redirect-prefix",
+        default=None,
+        help="Serve audio through a fronting nginx by returning an X-Accel-Redirect header pointing at this internal location (e.g. /protected) instead of streaming the file from Python.",
+    )
     parser.add_argument(
         "--limit",
         type=int,
@@ -528,6 +862,10 @@ def parse_arguments() -> argparse.Namespace:
 
     if args.sleep < 0:
         parser.error("--sleep must be greater than or equal to zero")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    if args.server_threads < 1:
+        parser.error("--server-threads must be at least 1")
 
     return args
 
@@ -542,15 +880,18 @@ def main():
             results_directory=args.results_directory,
             endpoint_hostname=args.endpoint_hostname,
             endpoint_port=args.endpoint_port,
+            server_threads=args.server_threads,
             sleep=args.sleep,
             batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            accel_redirect_prefix=args.accel_redirect_prefix,
             limit=args.limit,
             force=args.force,
             debug=args.debug,
         )
         submitter.run()
     except ValueError as e:
-        logging.error(f"Error: {e}")
+        logging.error("Error: %s", e)
         sys.exit(1)
 
 
@@ -1,44 +1,48 @@
-import subprocess
-import json
-from pydub import AudioSegment
+import heapq
+import soundfile as sf
 import srt
+import torch
+import whisperx
+
+WHISPER_MODEL = "small"
 
 
 def split_stereo(input_file, left_output, right_output):
-    audio = AudioSegment.from_file(input_file)
-    left_channel = audio.split_to_mono()[0]
-    right_channel = audio.split_to_mono()[1]
-    left_channel.export(left_output, format="wav")
-    right_channel.export(right_output, format="wav")
+    # Channel slices are views into the decoded PCM, so nothing is re-encoded
+    data, sample_rate = sf.read(input_file, dtype="int16")
+    sf.write(left_output, data[:, 0], sample_rate)
+    sf.write(right_output, data[:, 1], sample_rate)
+
+
+def load_whisperx_model(whisper_model=WHISPER_MODEL):
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    compute_type = "float16" if torch.cuda.is_available() else "int8"
+    return whisperx.load_model(whisper_model, device, compute_type=compute_type)
+
 
+def transcribe_with_whisperx(model, audio_file):
+    audio = whisperx.load_audio(audio_file)
+    return model.transcribe(audio, batch_size=16)
 
-def transcribe_with_whisperx(audio_file):
-    command = f"whisperx {audio_file} --output_format json"
-    result = subprocess.run(command, shell=True, capture_output=True, text=True)
-    return json.loads(result.stdout)
+
+def label_segments(transcription, label, channel):
+    for segment in transcription["segments"]:
+        yield {
+            "start": segment["start"],
+            "end": segment["end"],
+            "text": f"{label}: {segment['text']}",
+            "channel": channel,
+        }
 
 
 def merge_transcriptions(left_trans, right_trans, left_label, right_label):
-    merged = []
-    for segment in left_trans["segments"]:
-        merged.append(
-            {
-                "start": segment["start"],
-                "end": segment["end"],
-                "text": f"{left_label}: {segment['text']}",
-                "channel": "left",
-            }
-        )
-    for segment in right_trans["segments"]:
-        merged.append(
-            {
-                "start": segment["start"],
-                "end": segment["end"],
-                "text": f"{right_label}: {segment['text']}",
-                "channel": "right",
-            }
-        )
-    return sorted(merged, key=lambda x: x["start"])
+    # Each channel's segments are already in start order, so a linear merge
+    # is enough.
+    return heapq.merge(
+        label_segments(left_trans, left_label, "left"),
+        label_segments(right_trans, right_label, "right"),
+        key=lambda x: x["start"],
+    )
 
 
 def create_srt(merged_trans, output_file):
@@ -66,8 +70,11 @@ output_srt = "transcription.srt"
 
 split_stereo(input_file, left_output, right_output)
 
-left_trans = transcribe_with_whisperx(left_output)
-right_trans = transcribe_with_whisperx(right_output)
+# One model, loaded once; whisperx's pipeline keeps per-call tokenizer and
+# options state on the object, so the channels are transcribed in turn
+model = load_whisperx_model()
+left_trans = transcribe_with_whisperx(model, left_output)
+right_trans = transcribe_with_whisperx(model, right_output)
 
 merged_trans = merge_transcriptions(left_trans, right_trans, left_label, right_label)
 
@@ -2,56 +2,208 @@
 
 import whisperx
 from whisperx.utils import get_writer
+from faster_whisper import BatchedInferencePipeline, WhisperModel
 import torch
-import json
+import orjson
 import sys
 import os
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import gc
+from collections import Counter
+import numpy as np
 
 
 # DIARIZATIOIN_MODEL = "Revai/reverb-diarization-v2"
 DIARIZATIOIN_MODEL = "pyannote/speaker-diarization-3.1"
 OUTPUT_DIR = "output"
+SINGLE_SPEAKER_LABEL = "SPEAKER_00"
+OUTPUT_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="SrtWriter")
+# One model of each kind stays resident, so the three stages fit in VRAM together
+MODEL_CACHE_SIZE = 1
+WHISPER_BATCH_SIZE = 16
+WHISPER_BEAM_SIZE = 5
 
-def transcribe(input_file, whisper_model="large-v2", num_speakers=2, diarize=False):
+
+# Models are cached so repeated transcribe() calls in one process load them once
+@functools.lru_cache(maxsize=MODEL_CACHE_SIZE)
+def get_whisper_model(whisper_model, device, compute_type):
+    # faster-whisper's own batched pipeline, skipping whisperx's wrapper
+    return BatchedInferencePipeline(
+        model=WhisperModel(
+            whisper_model,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=os.cpu_count(),
+        )
+    )
+
+
+@functools.lru_cache(maxsize=MODEL_CACHE_SIZE)
+def get_align_model(language_code, device, compile_model=False):
+    model_a, metadata = whisperx.load_align_model(language_code=language_code, device=device)
+    if compile_model and device == "cuda":
+        # Opt-in: CUDA graphs amortize kernel launch overhead over the many
+        # small per-segment wav2vec2 forwards, but each new segment length
+        # recompiles, so this only pays off for long-lived processes
+        model_a = torch.compile(model_a, mode="reduce-overhead", fullgraph=False)
+    return model_a, metadata
+
+
+@functools.lru_cache(maxsize=MODEL_CACHE_SIZE)
+def get_diarize_model(model_name, device):
+    return whisperx.DiarizationPipeline(model_name=model_name, use_auth_token=os.environ.get("HUGGINGFACEHUB_API_TOKEN"), device=device)
+
+
+def transcribe_audio(model, audio):
+    # Materialize faster-whisper's lazy segments into whisperx's result format,
+    # which whisperx.align and the writers expect
+    segments, info = model.transcribe(
+        audio, batch_size=WHISPER_BATCH_SIZE, beam_size=WHISPER_BEAM_SIZE, vad_filter=True
+    )
+    return {
+        "segments": [
+            {"start": segment.start, "end": segment.end, "text": segment.text}
+            for segment in segments
+        ],
+        "language": info.language,
+    }
+
+
+def label_single_speaker(transcript_result, speaker=SINGLE_SPEAKER_LABEL):
+    for segment in transcript_result["segments"]:
+        segment["speaker"] = speaker
+        for word in segment.get("words", []):
+            word["speaker"] = speaker
+    return transcript_result
+
+
+def release_gpu_memory(cached_getter):
+    # The cache holds the last reference, so clear it before emptying CUDA's
+    cached_getter.cache_clear()
+    gc.collect()
+    torch.cuda.empty_cache()
+
+
+def find_speaker_turns(times, turn_starts, turn_ends):
+    # Turns are sorted by start. For each time, the candidate turns are the
+    # furthest-reaching turn that started at or before it and the next turn to
+    # start after it; the closer of the two wins (distance 0 when covered).
+    num_turns = len(turn_starts)
+    reach = np.maximum.accumulate(turn_ends)
+    reach_index = np.maximum.accumulate(
+        np.where(turn_ends == reach, np.arange(num_turns), 0)
+    )
+    prev = np.searchsorted(turn_starts, times, side="right") - 1
+    best_prev = reach_index[np.maximum(prev, 0)]
+    nxt = np.minimum(prev + 1, num_turns - 1)
+    dist_prev = np.where(prev >= 0, np.maximum(times - turn_ends[best_prev], 0), np.inf)
+    dist_next = np.where(prev + 1 < num_turns, turn_starts[nxt] - times, np.inf)
+    return np.where(dist_prev <= dist_next, best_prev, nxt)
+
+
+def assign_word_speakers(diarize_df, transcript_result):
+    """
+    Vectorized replacement for whisperx.assign_word_speakers.
+
+    Each word gets the speaker of the turn covering its midpoint, or of the
+    nearest turn if none covers it; each segment gets its words' majority
+    speaker. This is O(W log S) rather than whisperx's O(W * S) overlap scan.
+    """
+    if diarize_df.empty:
+        return transcript_result
+    turns = diarize_df.sort_values("start")
+    turn_starts = turns["start"].to_numpy(dtype=float)
+    turn_ends = turns["end"].to_numpy(dtype=float)
+    turn_speakers = turns["speaker"].tolist()
+
+    segments = transcript_result["segments"]
+    words = [
+        word
+        for segment in segments
+        for word in segment.get("words", [])
+        if "start" in word and "end" in word
+    ]
+    if words:
+        midpoints = np.array([(word["start"] + word["end"]) / 2 for word in words])
+        for word, index in zip(words, find_speaker_turns(midpoints, turn_starts, turn_ends).tolist()):
+            word["speaker"] = turn_speakers[index]
+
+    for segment in segments:
+        speakers = [word["speaker"] for word in segment.get("words", []) if "speaker" in word]
+        if speakers:
+            segment["speaker"] = Counter(speakers).most_common(1)[0][0]
+        else:
+            midpoint = np.array([(segment["start"] + segment["end"]) / 2])
+            segment["speaker"] = turn_speakers[int(find_speaker_turns(midpoint, turn_starts, turn_ends)[0])]
+    return transcript_result
+
+
+def write_outputs(srt_result, input_file, output_dir, result):
+    srt_writer = get_writer("srt", output_dir)
+    srt_writer(
+        srt_result,
+        input_file,
+        {"max_line_width": None, "max_line_count": None, "highlight_words": False}
+    )
+
+    with open(output_dir + '/output.json', 'wb') as f:
+        f.write(orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+
+    print(f"Transcription completed. Output saved to {output_dir}")
+
+
+def transcribe(input_file, whisper_model="large-v2", num_speakers=2, diarize=False, compute_type=None, release_models=False, compile_align_model=False):
 
     try:
         # Set up device
         device = "cuda" if torch.cuda.is_available() else "cpu"
-        compute_type = "float16" if torch.cuda.is_available() else "int8"
+        # int8 weights with fp16 activations on GPU; pass "float16" to opt out
+        if compute_type is None:
+            compute_type = "int8_float16" if torch.cuda.is_available() else "int8"
 
-        # Load WhisperX model
-        model = whisperx.load_model(whisper_model, device, compute_type=compute_type)
+        # Load Whisper model
+        model = get_whisper_model(whisper_model, device, compute_type)
 
         # Transcribe audio
         audio = whisperx.load_audio(input_file)
-        result = model.transcribe(audio, batch_size=16)
+        result = transcribe_audio(model, audio)
+        # Free each stage's model before the next one loads on smaller GPUs
+        free_gpu_memory = release_models and device == "cuda"
+        if free_gpu_memory:
+            del model
+            release_gpu_memory(get_whisper_model)
 
         # Load alignment model and align
-        model_a, metadata = whisperx.load_align_model(language_code=result["language"], device=device)
-        aligned_result = whisperx.align(result["segments"], model_a, metadata, audio, device, return_char_alignments=False)
+        model_a, metadata = get_align_model(result["language"], device, compile_align_model)
+        # Mixed precision, no autograd bookkeeping for the wav2vec2 forward passes
+        with torch.inference_mode(), torch.autocast(device_type=device, dtype=torch.float16, enabled=(device == "cuda")):
+            aligned_result = whisperx.align(result["segments"], model_a, metadata, audio, device, return_char_alignments=False)
         aligned_result["language"] = result["language"]
+        if free_gpu_memory:
+            del model_a
+            release_gpu_memory(get_align_model)
 
         # Diarize
-        if diarize:
-            diarize_model = whisperx.DiarizationPipeline(model_name=DIARIZATIOIN_MODEL, use_auth_token=os.environ.get("HUGGINGFACEHUB_API_TOKEN"), device=device)
+        if diarize and num_speakers == 1:
+            # A single speaker needs no diarization pass, only the label
+            diarize_result = label_single_speaker(aligned_result)
+        elif diarize:
+            diarize_model = get_diarize_model(DIARIZATIOIN_MODEL, device)
             diarization_segments = diarize_model(audio, num_speakers=num_speakers)
+            if free_gpu_memory:
+                del diarize_model
+                release_gpu_memory(get_diarize_model)
             # Assign speaker labels
-            diarize_result = whisperx.assign_word_speakers(diarization_segments, aligned_result)
-            diarize_result["language"] = result["language"]
-
-        srt_writer = get_writer("srt", OUTPUT_DIR)
-        srt_writer(
-            diarize and diarize_result or aligned_result,
-            input_file,
-            {"max_line_width": None, "max_line_count": None, "highlight_words": False}
-        )
-
-        with open(OUTPUT_DIR + '/output.json', 'w') as f:
-            json.dump(result, f, indent=4)
+            diarize_result = assign_word_speakers(diarization_segments, aligned_result)
 
-        print(f"Transcription completed. Output saved to {OUTPUT_DIR}")
+        # Hand file output to the writer thread so the caller can start the next
+        # file on the GPU straight away
+        write_future = OUTPUT_WRITER.submit(
+            write_outputs, diarize_result if diarize else aligned_result, input_file, OUTPUT_DIR, result
+        )
 
-        return result
+        return result, write_future
     except Exception as e:
         print(f"An error occurred during transcription: {str(e)}")
         raise
@@ -67,4 +219,5 @@ if __name__ == "__main__":
     whisper_model = "large-v2"
     num_speakers = 2
 
-    result = transcribe(input_file, whisper_model, num_speakers, diarize)
+    result, write_future = transcribe(input_file, whisper_model, num_speakers, diarize)
+    write_future.result()